@@ -24,6 +24,10 @@ class IdPlusSelfieStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        # Origin the frontend is served from, e.g. the CloudFront distribution
+        # URL once deployed (cdk deploy -c site_origin=https://...)
+        site_origin = self.node.try_get_context("site_origin") or "http://localhost:3000"
+
         # Initialize Klayers Class
         klayers = Klayers(
             self,
@@ -44,6 +48,15 @@ class IdPlusSelfieStack(Stack):
             versioned=True,
             removal_policy=RemovalPolicy.DESTROY,
             auto_delete_objects=True,
+            # Allow browsers to POST images directly via presigned forms
+            cors=[
+                s3.CorsRule(
+                    allowed_methods=[s3.HttpMethods.POST],
+                    allowed_origins=[site_origin],
+                    allowed_headers=["*"],
+                    max_age=3000
+                )
+            ],
             lifecycle_rules=[
                 s3.LifecycleRule(
                     transitions=[
@@ -147,6 +160,7 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_upload_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(6),
             environment={
@@ -160,6 +174,30 @@ class IdPlusSelfieStack(Stack):
 
         upload_bucket.grant_read_write(id_upload_lambda)
 
+        # Hands out presigned upload forms so clients upload images directly to S3
+        id_presign_lambda = _lambda.Function(
+            self,
+            "IDHandlerPresign",
+            code=_lambda.Code.from_asset("lambda"),
+            handler="id_presign_lambda.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
+            memory_size=128,
+            timeout=Duration.seconds(6),
+            environment={
+                "LOG_LEVEL": "INFO",  # Add a log level for runtime control
+                "DYNAMODB_TABLE_NAME": verification_table.table_name,
+                "S3_BUCKET_NAME": upload_bucket.bucket_name,
+                "TTL_DAYS": "365",
+                "URL_EXPIRATION_SECONDS": "300"
+            },
+            log_retention=logs.RetentionDays.ONE_WEEK,  # Set log retention period
+        )
+
+        # The presigned upload forms are signed with this function's role
+        upload_bucket.grant_put(id_presign_lambda)
+        verification_table.grant_write_data(id_presign_lambda)
+
         # Step Functions
         # Create the beginning Lambda for the SM
         id_trigger_stepfunction_lambda = _lambda.Function(
@@ -168,6 +206,7 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_trigger_stepfunction_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(6),
             environment={
@@ -184,8 +223,15 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_moderate_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(10),
+            # Workflow tasks invoke published versions, restored from a
+            # snapshot of the initialized module instead of a cold INIT. Heavy
+            # imports belong at module scope so they are in the snapshot, and
+            # INIT must not open network connections, which would be stale on
+            # restore.
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
             environment={
                 "LOG_LEVEL": "INFO",  # Add a log level for runtime control
                 "S3_BUCKET_NAME": upload_bucket.bucket_name,
@@ -212,8 +258,10 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_analyze_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(10),
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
             environment={
                 "LOG_LEVEL": "INFO",  # Add a log level for runtime control
                 "S3_BUCKET_NAME": upload_bucket.bucket_name,
@@ -238,8 +286,10 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_compare_faces_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(10),
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
             environment={
                 "LOG_LEVEL": "INFO",  # Add a log level for runtime control
                 "S3_BUCKET_NAME": upload_bucket.bucket_name,
@@ -256,8 +306,11 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_resize_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            # The Klayers Pillow layer is built for x86_64
+            architecture=_lambda.Architecture.X86_64,
             memory_size=256,
             timeout=Duration.seconds(30),
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
             layers=[pil_layer],
             environment={
                 "LOG_LEVEL": "INFO",  # Add a log level for runtime control
@@ -275,9 +328,10 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_send_email_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(30),
-            layers=[pil_layer],
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
             environment={
                 "LOG_LEVEL": "INFO",  # Add a log level for runtime control
                 # You must change this to a value you own
@@ -337,17 +391,19 @@ class IdPlusSelfieStack(Stack):
                 "user_email.$": "$.user_email",
                 "id_key.$": "$.id_key",
                 "selfie_key.$": "$.selfie_key",
+                "record_timestamp.$": "$.record_timestamp",
                 "success": True
             }
         )
 
         moderate_task = stepfunctions_tasks.LambdaInvoke(
             self, "ModerateImages",
-            lambda_function=id_moderate_lambda,
+            lambda_function=id_moderate_lambda.current_version,
             payload=stepfunctions.TaskInput.from_object({
                 "verification_id.$": "$.verification_id",
                 "id_key.$": "$.id_key",
                 "selfie_key.$": "$.selfie_key",
+                "record_timestamp.$": "$.record_timestamp",
                 "timestamp.$": "$$.Execution.StartTime"
             }),
             result_path="$.moderation_result"  # Store result in this path
@@ -355,10 +411,11 @@ class IdPlusSelfieStack(Stack):
 
         analyze_id_task = stepfunctions_tasks.LambdaInvoke(
             self, "AnalyzeIDDocument",
-            lambda_function=id_analyze_lambda,
+            lambda_function=id_analyze_lambda.current_version,
             payload=stepfunctions.TaskInput.from_object({
                 "verification_id.$": "$.verification_id",
                 "id_key.$": "$.id_key",
+                "record_timestamp.$": "$.record_timestamp",
                 "timestamp.$": "$$.Execution.StartTime"
             }),
             result_path="$.id_analysis_result"  # Store result in this path
@@ -366,11 +423,12 @@ class IdPlusSelfieStack(Stack):
 
         compare_faces_task = stepfunctions_tasks.LambdaInvoke(
             self, "CompareFaces",
-            lambda_function=id_compare_faces_lambda,
+            lambda_function=id_compare_faces_lambda.current_version,
             payload=stepfunctions.TaskInput.from_object({
                 "verification_id.$": "$.verification_id",
                 "id_key.$": "$.id_key",
                 "selfie_key.$": "$.selfie_key",
+                "record_timestamp.$": "$.record_timestamp",
                 "timestamp.$": "$$.Execution.StartTime"
             }),
             result_path="$.comparison_result"  # Store result in this path
@@ -378,19 +436,23 @@ class IdPlusSelfieStack(Stack):
 
         resize_task = stepfunctions_tasks.LambdaInvoke(
             self, "ResizeImages",
-            lambda_function=id_resize_lambda,
+            lambda_function=id_resize_lambda.current_version,
             payload=stepfunctions.TaskInput.from_object({
                 "verification_id.$": "$.verification_id",
                 "id_key.$": "$.id_key",
                 "selfie_key.$": "$.selfie_key",
+                "record_timestamp.$": "$.record_timestamp",
                 "timestamp.$": "$$.Execution.StartTime"
             }),
             result_path="$.resize_result"  # Store result in this path
         )
 
+        # The emails are sent with asynchronous (Event) invocations, so SES
+        # latency and throttling retries stay out of the execution's duration
         send_success_email = stepfunctions_tasks.LambdaInvoke(
             self, "SendSuccessEmail",
-            lambda_function=send_email_lambda,
+            lambda_function=send_email_lambda.current_version,
+            invocation_type=stepfunctions_tasks.LambdaInvocationType.EVENT,
             payload=stepfunctions.TaskInput.from_object({
                 "verification_id.$": "$.verification_id",
                 "success": True,
@@ -409,7 +471,8 @@ class IdPlusSelfieStack(Stack):
 
         send_failure_email = stepfunctions_tasks.LambdaInvoke(
             self, "SendFailureEmail",
-            lambda_function=send_email_lambda,
+            lambda_function=send_email_lambda.current_version,
+            invocation_type=stepfunctions_tasks.LambdaInvocationType.EVENT,
             payload=stepfunctions.TaskInput.from_object({
                 "verification_id.$": "$.verification_id",
                 "success": False,
@@ -456,6 +519,7 @@ class IdPlusSelfieStack(Stack):
                 "user_email.$": "$.user_email",
                 "id_key.$": "$.id_key",
                 "selfie_key.$": "$.selfie_key",
+                "record_timestamp.$": "$.record_timestamp",
                 "success": True
             }
         )
@@ -551,22 +615,24 @@ class IdPlusSelfieStack(Stack):
             )
         )
 
-        # Add S3 notifications
-        upload_bucket.add_event_notification(
-            s3.EventType.OBJECT_CREATED_PUT,
-            s3n.LambdaDestination(id_trigger_stepfunction_lambda),
-            s3.NotificationKeyFilter(
-                prefix="identity/"
+        # Add S3 notifications, for images uploaded by the upload Lambda (PUT)
+        # and by clients through presigned forms (POST)
+        for event_type in (s3.EventType.OBJECT_CREATED_PUT, s3.EventType.OBJECT_CREATED_POST):
+            upload_bucket.add_event_notification(
+                event_type,
+                s3n.LambdaDestination(id_trigger_stepfunction_lambda),
+                s3.NotificationKeyFilter(
+                    prefix="identity/"
+                )
             )
-        )
 
-        upload_bucket.add_event_notification(
-            s3.EventType.OBJECT_CREATED_PUT,
-            s3n.LambdaDestination(id_trigger_stepfunction_lambda),
-            s3.NotificationKeyFilter(
-                prefix="selfie/"
+            upload_bucket.add_event_notification(
+                event_type,
+                s3n.LambdaDestination(id_trigger_stepfunction_lambda),
+                s3.NotificationKeyFilter(
+                    prefix="selfie/"
+                )
             )
-        )
 
         id_delete_lambda = _lambda.Function(
             self,
@@ -574,6 +640,7 @@ class IdPlusSelfieStack(Stack):
             code=_lambda.Code.from_asset("lambda"),
             handler="id_delete_lambda.lambda_handler",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.ARM_64,
             memory_size=256,
             timeout=Duration.seconds(6),
             environment={
@@ -760,6 +827,38 @@ class IdPlusSelfieStack(Stack):
             source_arn=api.arn_for_execute_api()
         )
 
+        # ID Verification - Presigned direct upload
+        id_presign_integration = apigateway.LambdaIntegration(
+            id_presign_lambda,
+            proxy=True,
+            integration_responses=[success_response, error_response]
+        )
+
+        presign_resource = api.root.add_resource("id-verify-presign")
+        presign_resource.add_method(
+            "POST",
+            id_presign_integration,
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200",
+                    response_parameters={
+                        'method.response.header.Access-Control-Allow-Origin': True,
+                        'method.response.header.Access-Control-Allow-Headers': True,
+                        'method.response.header.Access-Control-Allow-Methods': True
+                    }
+                ),
+                apigateway.MethodResponse(
+                    status_code="401",
+                    response_parameters={
+                        'method.response.header.Access-Control-Allow-Origin': True
+                    }
+                )
+            ],
+            api_key_required=True,
+            authorizer=cognito_authorizer,
+            authorization_type=apigateway.AuthorizationType.COGNITO
+        )
+
         # ID Verification - Delete
         id_verify_resource_delete = api.root.add_resource(
             "id-verify-delete")
@@ -833,6 +932,11 @@ class IdPlusSelfieStack(Stack):
                 "description": "Endpoint for ID Verification",
                 "export_name": f"{self.stack_name}-ApiEndpoint-id-verify"
             },
+            "ApiEndpoint_id-verify-presign": {
+                "value": f"{api.url}id-verify-presign",
+                "description": "Endpoint for presigned direct-to-S3 image uploads",
+                "export_name": f"{self.stack_name}-ApiEndpoint-id-verify-presign"
+            },
             "ApiEndpoint_id-verify-delete": {
                 "value": f"{api.url}id-verify-delete",
                 "description": "Endpoint for deletion of a previous comparison",
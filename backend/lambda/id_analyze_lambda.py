@@ -3,24 +3,40 @@ import json
 import os
 import logging
 from decimal import Decimal
-from datetime import datetime, timezone
-from urllib.parse import urlparse
+import time
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Get environment variables once per container; a missing one fails the
+# cold start instead of every invocation
+TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
 
 # Initialize clients
-textract_client = boto3.client('textract')
-dynamodb = boto3.resource('dynamodb')
+textract_client = boto3.client('textract', config=boto_config)
+dynamodb_client = boto3.client('dynamodb', config=boto_config)
+serializer = TypeSerializer()
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-def get_s3_key_from_uri(s3_uri):
-    """
-    Extracts the S3 key from a full S3 URI
-    Example: "s3://bucket-name/path/to/file.jpg" -> "path/to/file.jpg"
-    """
-    parsed = urlparse(s3_uri)
-    return parsed.path.lstrip('/')
+# DynamoDB update expression for the ID analysis results
+_UPDATE_EXPR = (
+    "SET IDAnalysisResults = :results, "
+    "IDAnalysisStatus = :status, "
+    "LastUpdated = :updated, "
+    "AnalyzedAt = :analyzed_at, "
+    "DocumentType = :doc_type, "
+    "DocumentNumber = :doc_number"
+)
 
 def extract_field_value(fields, field_type):
     """
@@ -83,39 +99,38 @@ def analyze_id_document(photo, bucket):
         logger.error(f"Error analyzing ID document {photo} in bucket {bucket}: {str(e)}")
         raise
 
-def update_dynamodb_record(verification_id, analysis_results):
+def update_dynamodb_record(verification_id, analysis_results, record_timestamp=None):
     """
-    Updates the DynamoDB record with ID analysis results
+    Updates the DynamoDB record with ID analysis results.
+    When the record's Timestamp sort key is passed in from the Step Functions
+    input, the item is updated directly without querying for it first.
     """
     try:
-        table = dynamodb.Table(os.environ['DYNAMODB_TABLE_NAME'])
-        
-        # First, query to get the item's Timestamp
-        response = table.query(
-            KeyConditionExpression='VerificationId = :vid',
-            ExpressionAttributeValues={
-                ':vid': verification_id
-            },
-            ScanIndexForward=False,
-            Limit=1
-        )
-        
-        if not response['Items']:
-            raise Exception(f"No record found for verification ID: {verification_id}")
+        if record_timestamp is not None:
+            timestamp = {'N': str(record_timestamp)}
+        else:
+            # Fall back to querying for the item's Timestamp
+            response = dynamodb_client.query(
+                TableName=TABLE_NAME,
+                KeyConditionExpression='VerificationId = :vid',
+                ProjectionExpression='#ts',
+                ExpressionAttributeNames={
+                    '#ts': 'Timestamp'  # Timestamp is a reserved word in DynamoDB
+                },
+                ExpressionAttributeValues={
+                    ':vid': {'S': verification_id}
+                },
+                ScanIndexForward=False,
+                Limit=1
+            )
             
-        timestamp = response['Items'][0]['Timestamp']
-        current_time = Decimal(str(datetime.now(timezone.utc).timestamp()))
-        
-        # Prepare update expression and values
-        update_expression = """
-            SET IDAnalysisResults = :results,
-                IDAnalysisStatus = :status,
-                LastUpdated = :updated,
-                AnalyzedAt = :analyzed_at,
-                DocumentType = :doc_type,
-                DocumentNumber = :doc_number
-        """
+            if not response['Items']:
+                raise Exception(f"No record found for verification ID: {verification_id}")
+                
+            timestamp = response['Items'][0]['Timestamp']
+        current_time = Decimal(time.time_ns() // 1000).scaleb(-6)
         
+        # Prepare update values
         expression_values = {
             ':results': analysis_results['fields'],
             ':status': 'COMPLETED',
@@ -125,14 +140,19 @@ def update_dynamodb_record(verification_id, analysis_results):
             ':doc_number': analysis_results['fields'].get('document_number', {}).get('text', 'UNKNOWN')
         }
         
-        # Update DynamoDB
-        table.update_item(
+        # Update DynamoDB, serializing values to the low-level attribute format
+        dynamodb_client.update_item(
+            TableName=TABLE_NAME,
             Key={
-                'VerificationId': verification_id,
+                'VerificationId': {'S': verification_id},
                 'Timestamp': timestamp
             },
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values
+            UpdateExpression=_UPDATE_EXPR,
+            # Never create a new item if the key does not match an existing record
+            ConditionExpression='attribute_exists(VerificationId)',
+            ExpressionAttributeValues={
+                k: serializer.serialize(v) for k, v in expression_values.items()
+            }
         )
         
         logger.info(f"Updated DynamoDB record for verification ID: {verification_id}")
@@ -147,21 +167,18 @@ def lambda_handler(event, context):
     AWS Lambda handler for processing ID analysis as part of Step Functions workflow
     """
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event, default=str))
         
         verification_id = event['verification_id']
-        bucket_name = os.environ.get('S3_BUCKET_NAME')
-        
-        if not bucket_name:
-            raise ValueError("S3_BUCKET_NAME environment variable is not set.")
         
-        # Extract S3 key from full URI
-        id_key = get_s3_key_from_uri(event['id_key'])
+        # The state machine passes a bare S3 key
+        id_key = event['id_key']
         
         logger.info(f"Processing ID document: {id_key}")
         
         # Analyze ID document
-        analysis_results = analyze_id_document(id_key, bucket_name)
+        analysis_results = analyze_id_document(id_key, S3_BUCKET_NAME)
         
         if not analysis_results:
             return {
@@ -172,7 +189,7 @@ def lambda_handler(event, context):
             }
         
         # Update DynamoDB with results
-        update_dynamodb_record(verification_id, analysis_results)
+        update_dynamodb_record(verification_id, analysis_results, event.get('record_timestamp'))
         
         # Check if all required fields are present with acceptable confidence
         required_fields = ['first_name', 'last_name', 'date_of_birth', 'expiration_date']
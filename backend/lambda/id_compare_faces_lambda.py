@@ -2,71 +2,97 @@ import boto3
 import json
 import logging
 import os
+import time
 from datetime import datetime, timezone
 from decimal import Decimal
-from urllib.parse import urlparse
+from botocore.config import Config
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Get environment variables once per container; a missing one fails the
+# cold start instead of every invocation
+TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
 
 # Initialize clients
-dynamodb = boto3.resource('dynamodb')
-rekognition = boto3.client('rekognition')
-s3_client = boto3.client('s3')
-table = dynamodb.Table(os.environ['DYNAMODB_TABLE_NAME'])
+dynamodb = boto3.resource('dynamodb', config=boto_config)
+rekognition = boto3.client('rekognition', config=boto_config)
+table = dynamodb.Table(TABLE_NAME)
 
-def get_s3_key_from_uri(s3_uri):
+# DynamoDB update expressions for the status update, with and without comparison results
+_STATUS_EXPR = "SET #status = :status, LastUpdated = :updated"
+_STATUS_WITH_RESULTS_EXPR = (
+    _STATUS_EXPR + ", FaceMatchResults = :results, FaceMatchConfidence = :confidence"
+)
+
+def update_status(verification_id, status, comparison_results=None, record_timestamp=None):
     """
-    Extracts the S3 key from a full S3 URI
+    Updates the verification status, addressing the item directly when the
+    record's Timestamp sort key is passed in from the Step Functions input
     """
-    parsed = urlparse(s3_uri)
-    return parsed.path.lstrip('/')
-
-def update_status(verification_id, status, comparison_results=None):
     try:
-        # First, query to get the item's Timestamp
-        response = table.query(
-            KeyConditionExpression='VerificationId = :vid',
-            ExpressionAttributeValues={
-                ':vid': verification_id
-            },
-            ScanIndexForward=False,
-            Limit=1
-        )
-        
-        if response['Items']:
-            timestamp = response['Items'][0]['Timestamp']
-            current_time = Decimal(str(datetime.now(timezone.utc).timestamp()))
-            
-            update_expression = "SET #status = :status, LastUpdated = :updated"
-            expression_values = {
-                ':status': status,
-                ':updated': current_time
-            }
-            
-            # Add comparison results if available
-            if comparison_results:
-                update_expression += ", FaceMatchResults = :results, FaceMatchConfidence = :confidence"
-                expression_values[':results'] = comparison_results
-                expression_values[':confidence'] = comparison_results.get('Similarity', Decimal('0'))
-            
-            # Update the status
-            table.update_item(
-                Key={
-                    'VerificationId': verification_id,
-                    'Timestamp': timestamp
-                },
-                UpdateExpression=update_expression,
+        if record_timestamp is not None:
+            timestamp = Decimal(str(record_timestamp))
+        else:
+            # Fall back to querying for the item's Timestamp
+            response = table.query(
+                KeyConditionExpression='VerificationId = :vid',
+                ProjectionExpression='#ts',
                 ExpressionAttributeNames={
-                    '#status': 'Status'  # Status is a reserved word in DynamoDB
+                    '#ts': 'Timestamp'  # Timestamp is a reserved word in DynamoDB
                 },
-                ExpressionAttributeValues=expression_values
+                ExpressionAttributeValues={
+                    ':vid': verification_id
+                },
+                ScanIndexForward=False,
+                Limit=1
             )
-            logger.info(f"Updated status to {status} for verification ID: {verification_id}")
-        else:
-            logger.error(f"No record found for verification ID: {verification_id}")
-            raise Exception("Record not found")
+            
+            if not response['Items']:
+                logger.error(f"No record found for verification ID: {verification_id}")
+                raise Exception("Record not found")
+            
+            timestamp = response['Items'][0]['Timestamp']
+        
+        current_time = Decimal(time.time_ns() // 1000).scaleb(-6)
+        
+        update_expression = _STATUS_EXPR
+        expression_values = {
+            ':status': status,
+            ':updated': current_time
+        }
+        
+        # Add comparison results if available
+        if comparison_results:
+            update_expression = _STATUS_WITH_RESULTS_EXPR
+            expression_values[':results'] = comparison_results
+            expression_values[':confidence'] = comparison_results.get('Similarity', Decimal('0'))
+        
+        # Update the status
+        table.update_item(
+            Key={
+                'VerificationId': verification_id,
+                'Timestamp': timestamp
+            },
+            UpdateExpression=update_expression,
+            # Never create a new item if the key does not match an existing record
+            ConditionExpression='attribute_exists(VerificationId)',
+            ReturnValues='NONE',
+            ExpressionAttributeNames={
+                '#status': 'Status'  # Status is a reserved word in DynamoDB
+            },
+            ExpressionAttributeValues=expression_values
+        )
+        logger.info(f"Updated status to {status} for verification ID: {verification_id}")
             
     except Exception as e:
         logger.error(f"Error updating status: {str(e)}")
@@ -108,14 +134,14 @@ def compare_faces(source_key, target_key, bucket):
             
             return {
                 'Matched': True,
-                'Similarity': Decimal(str(face_match['Similarity'])).quantize(Decimal('.01')),
+                'Similarity': Decimal(f"{face_match['Similarity']:.2f}"),
                 'BoundingBox': {
-                    'Width': Decimal(str(bounding_box['Width'])).quantize(Decimal('.001')),
-                    'Height': Decimal(str(bounding_box['Height'])).quantize(Decimal('.001')),
-                    'Left': Decimal(str(bounding_box['Left'])).quantize(Decimal('.001')),
-                    'Top': Decimal(str(bounding_box['Top'])).quantize(Decimal('.001'))
+                    'Width': Decimal(f"{bounding_box['Width']:.3f}"),
+                    'Height': Decimal(f"{bounding_box['Height']:.3f}"),
+                    'Left': Decimal(f"{bounding_box['Left']:.3f}"),
+                    'Top': Decimal(f"{bounding_box['Top']:.3f}")
                 },
-                'Confidence': Decimal(str(face_match['Face']['Confidence'])).quantize(Decimal('.01'))
+                'Confidence': Decimal(f"{face_match['Face']['Confidence']:.2f}")
             }
         else:
             return {
@@ -130,23 +156,22 @@ def compare_faces(source_key, target_key, bucket):
 
 def lambda_handler(event, context):
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event, default=str))
         
         verification_id = event['verification_id']
-        bucket_name = os.environ.get('S3_BUCKET_NAME')
-        
-        if not bucket_name:
-            raise ValueError("S3_BUCKET_NAME environment variable is not set.")
+        record_timestamp = event.get('record_timestamp')
         
-        # Extract S3 keys from full URIs
-        id_key = get_s3_key_from_uri(event['id_key'])
-        selfie_key = get_s3_key_from_uri(event['selfie_key'])
+        # The state machine passes bare S3 keys
+        id_key = event['id_key']
+        selfie_key = event['selfie_key']
         
-        # Update initial status
-        update_status(verification_id, "COMPARING_FACES")
+        # Record the in-progress state in the logs only; the final status
+        # update below is the single DynamoDB write for this step
+        logger.info(f"Comparing faces for verification ID: {verification_id} - Status: COMPARING_FACES")
         
         # Perform face comparison
-        comparison_results = compare_faces(id_key, selfie_key, bucket_name)
+        comparison_results = compare_faces(id_key, selfie_key, S3_BUCKET_NAME)
         
         # Determine success based on match results and minimum similarity threshold
         min_similarity_threshold = Decimal('80')  # 80% similarity threshold
@@ -156,7 +181,7 @@ def lambda_handler(event, context):
         final_status = "FACE_MATCH_SUCCESSFUL" if success else "FACE_MATCH_FAILED"
         
         # Update final status with comparison results
-        update_status(verification_id, final_status, comparison_results)
+        update_status(verification_id, final_status, comparison_results, record_timestamp)
         
         # Convert Decimal to string for JSON serialization
         response_results = {
@@ -189,7 +214,8 @@ def lambda_handler(event, context):
         try:
             # Update status to failed if we have the verification_id
             if 'verification_id' in locals():
-                update_status(verification_id, "FACE_COMPARISON_FAILED")
+                update_status(verification_id, "FACE_COMPARISON_FAILED",
+                              record_timestamp=event.get('record_timestamp'))
         except Exception as update_error:
             logger.error(f"Error updating failure status: {str(update_error)}")
         
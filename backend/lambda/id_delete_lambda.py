@@ -2,21 +2,62 @@ import boto3
 import logging
 import os
 import json
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-# Initialize DynamoDB and S3 clients
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Initialize DynamoDB and S3 clients from a single session so they share one
+# credential resolver
+session = boto3.session.Session()
+dynamodb = session.resource('dynamodb', config=boto_config)
+s3 = session.client('s3', config=boto_config)
 
 # Get the DynamoDB table name and S3 bucket name from environment variables
 TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
 
+# Table handle reused across warm invocations
+table = dynamodb.Table(TABLE_NAME)
+
+# Static CORS headers shared by every response
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key',
+    'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
+}
+
+# Compact JSON encoder for response bodies, built once per container
+_ENCODE = json.JSONEncoder(separators=(',', ':')).encode
+
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Item attributes holding the S3 URIs of the originals and their resized copies
+S3_KEY_ATTRIBUTES = (
+    'IdentificationS3Key',
+    'IdentificationImageResizedS3Key',
+    'SelfieImageS3Key',
+    'SelfieImageResizedS3Key'
+)
+
+def get_s3_key_from_uri(s3_uri):
+    """
+    Extracts the S3 key from a full S3 URI
+    Example: "s3://bucket-name/path/to/file.jpg" -> "path/to/file.jpg"
+    """
+    if s3_uri.startswith('s3://'):
+        return s3_uri.split('/', 3)[3]
+    return s3_uri.lstrip('/')
 
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", json.dumps(event, default=str))
 
     try:
         # Extract verificationId from query parameters
@@ -27,9 +68,12 @@ def lambda_handler(event, context):
             return cors_response(400, {'error': "Missing verificationId in the request"})
 
         # Query the item to get its Timestamp and S3 keys
-        table = dynamodb.Table(TABLE_NAME)
         response = table.query(
             KeyConditionExpression='VerificationId = :vid',
+            ProjectionExpression=', '.join(('#ts',) + S3_KEY_ATTRIBUTES),
+            ExpressionAttributeNames={
+                '#ts': 'Timestamp'  # Timestamp is a reserved word in DynamoDB
+            },
             ExpressionAttributeValues={
                 ':vid': verification_id
             }
@@ -43,22 +87,39 @@ def lambda_handler(event, context):
         # Assuming there's only one item per VerificationId
         item = items[0]
         timestamp = item.get('Timestamp')
-        id_s3_key = item.get('IdentificationS3Key')
-        selfie_s3_key = item.get('SelfieImageS3Key')
-
-        # Delete the item from DynamoDB
-        table.delete_item(
-            Key={
-                'VerificationId': verification_id,
-                'Timestamp': timestamp
-            }
-        )
+        s3_keys = [
+            get_s3_key_from_uri(item[attribute])
+            for attribute in S3_KEY_ATTRIBUTES
+            if item.get(attribute)
+        ]
+
+        # Delete the original and resized objects from S3 (in a single request)
+        # before the item, so the record that points at them is kept until they
+        # are gone and a failed request can simply be retried
+        if s3_keys:
+            response = s3.delete_objects(
+                Bucket=S3_BUCKET_NAME,
+                Delete={
+                    'Objects': [{'Key': key} for key in s3_keys],
+                    'Quiet': True
+                }
+            )
+            errors = response.get('Errors', [])
+            if errors:
+                for error in errors:
+                    logger.error(f"Failed to delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+                return cors_response(500, {'error': f"Failed to delete some files for VerificationId: {verification_id}; the record was kept, retry the request"})
 
-        # Delete the objects from S3
-        if id_s3_key:
-            s3.delete_object(Bucket=S3_BUCKET_NAME, Key=id_s3_key)
-        if selfie_s3_key:
-            s3.delete_object(Bucket=S3_BUCKET_NAME, Key=selfie_s3_key)
+        try:
+            table.delete_item(
+                Key={
+                    'VerificationId': verification_id,
+                    'Timestamp': timestamp
+                }
+            )
+        except ClientError as e:
+            logger.error(f"Files deleted but the record could not be removed for VerificationId {verification_id}: {str(e)}")
+            return cors_response(500, {'error': f"Files for VerificationId {verification_id} were deleted but the record could not be removed; retry the request"})
 
         logger.info(f"Item with VerificationId {verification_id} and associated S3 objects deleted successfully")
         return cors_response(200, {'message': f"Verification with ID {verification_id} and associated files deleted successfully"})
@@ -73,10 +134,6 @@ def lambda_handler(event, context):
 def cors_response(status_code, body):
     return {
         'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key',
-            'Access-Control-Allow-Methods': 'DELETE,OPTIONS'
-        },
-        'body': json.dumps(body)
+        'headers': CORS_HEADERS,
+        'body': _ENCODE(body)
     }
@@ -3,24 +3,37 @@ import json
 import os
 import logging
 from decimal import Decimal
-from datetime import datetime, timezone
-from urllib.parse import urlparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Get environment variables once per container; a missing one fails the
+# cold start instead of every invocation
+TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
 
 # Initialize clients
-rekognition_client = boto3.client('rekognition')
-dynamodb = boto3.resource('dynamodb')
+rekognition_client = boto3.client('rekognition', config=boto_config)
+dynamodb = boto3.resource('dynamodb', config=boto_config)
+table = dynamodb.Table(TABLE_NAME)
+
+# Thread pool reused across warm invocations for the two moderation calls
+executor = ThreadPoolExecutor(max_workers=2)
+
+# Labels above this confidence fail moderation. It is also passed to
+# Rekognition as MinConfidence, which drops anything below it
+MIN_CONFIDENCE = 80.0
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-def get_s3_key_from_uri(s3_uri):
-    """
-    Extracts the S3 key from a full S3 URI
-    Example: "s3://bucket-name/path/to/file.jpg" -> "path/to/file.jpg"
-    """
-    parsed = urlparse(s3_uri)
-    return parsed.path.lstrip('/')
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 def moderate_image(photo, bucket):
     """
@@ -30,46 +43,53 @@ def moderate_image(photo, bucket):
     try:
         logger.info(f"Moderating image: bucket={bucket}, key={photo}")
         response = rekognition_client.detect_moderation_labels(
-            Image={'S3Object': {'Bucket': bucket, 'Name': photo}}
+            Image={'S3Object': {'Bucket': bucket, 'Name': photo}},
+            MinConfidence=MIN_CONFIDENCE
         )
         
-        logger.info(f'Detected moderation labels for {photo}')
-        labels = []
-        for label in response.get('ModerationLabels', []):
-            logger.info(f"{label['Name']} : {label['Confidence']:.2f}")
-            logger.info(f"Parent: {label.get('ParentName', 'None')}")
-            labels.append({
+        labels = [
+            {
                 'Name': label['Name'],
-                'Confidence': float(Decimal(str(label['Confidence'])).quantize(Decimal('.01'))),
+                'Confidence': round(label['Confidence'], 2),
                 'ParentName': label.get('ParentName', None)
-            })
+            }
+            for label in response.get('ModerationLabels', [])
+        ]
+        logger.info(f"Detected moderation labels for {photo}: {json.dumps(labels)}")
         return labels
     except Exception as e:
         logger.error(f"Error detecting moderation labels for {photo} in bucket {bucket}: {str(e)}")
         raise
 
-def update_dynamodb_record(verification_id, moderation_results):
+def update_dynamodb_record(verification_id, moderation_results, record_timestamp=None):
     """
-    Updates the DynamoDB record with moderation results
+    Updates the DynamoDB record with moderation results.
+    When the record's Timestamp sort key is passed in from the Step Functions
+    input, the item is updated directly without querying for it first.
     """
     try:
-        table = dynamodb.Table(os.environ['DYNAMODB_TABLE_NAME'])
-        
-        # First, query to get the item's Timestamp
-        response = table.query(
-            KeyConditionExpression='VerificationId = :vid',
-            ExpressionAttributeValues={
-                ':vid': verification_id
-            },
-            ScanIndexForward=False,
-            Limit=1
-        )
-        
-        if not response['Items']:
-            raise Exception(f"No record found for verification ID: {verification_id}")
+        if record_timestamp is not None:
+            timestamp = Decimal(str(record_timestamp))
+        else:
+            # Fall back to querying for the item's Timestamp
+            response = table.query(
+                KeyConditionExpression='VerificationId = :vid',
+                ProjectionExpression='#ts',
+                ExpressionAttributeNames={
+                    '#ts': 'Timestamp'  # Timestamp is a reserved word in DynamoDB
+                },
+                ExpressionAttributeValues={
+                    ':vid': verification_id
+                },
+                ScanIndexForward=False,
+                Limit=1
+            )
             
-        timestamp = response['Items'][0]['Timestamp']
-        current_time = Decimal(str(datetime.now(timezone.utc).timestamp()))
+            if not response['Items']:
+                raise Exception(f"No record found for verification ID: {verification_id}")
+                
+            timestamp = response['Items'][0]['Timestamp']
+        current_time = Decimal(time.time_ns() // 1000).scaleb(-6)
         
         update_expression = """
             SET ModerationLabels = :labels,
@@ -79,7 +99,11 @@ def update_dynamodb_record(verification_id, moderation_results):
         """
         
         expression_values = {
-            ':labels': moderation_results['Labels'],
+            # DynamoDB needs Decimal numbers, so convert the confidences only here
+            ':labels': {
+                image: [{**label, 'Confidence': Decimal(str(label['Confidence']))} for label in labels]
+                for image, labels in moderation_results['Labels'].items()
+            },
             ':status': moderation_results['Status'],
             ':updated': current_time,
             ':moderated_at': current_time
@@ -91,6 +115,8 @@ def update_dynamodb_record(verification_id, moderation_results):
                 'Timestamp': timestamp
             },
             UpdateExpression=update_expression,
+            # Never create a new item if the key does not match an existing record
+            ConditionExpression='attribute_exists(VerificationId)',
             ExpressionAttributeValues=expression_values
         )
         
@@ -106,24 +132,23 @@ def lambda_handler(event, context):
     AWS Lambda handler for processing moderation labels as part of Step Functions workflow.
     """
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event, default=str))
         
         verification_id = event['verification_id']
-        bucket_name = os.environ.get('S3_BUCKET_NAME')
-        
-        if not bucket_name:
-            raise ValueError("S3_BUCKET_NAME environment variable is not set.")
         
-        # Extract S3 keys from full URIs
-        id_key = get_s3_key_from_uri(event['id_key'])
-        selfie_key = get_s3_key_from_uri(event['selfie_key'])
+        # The state machine passes bare S3 keys
+        id_key = event['id_key']
+        selfie_key = event['selfie_key']
         
         logger.info(f"Processing identity image: {id_key}")
         logger.info(f"Processing Selfie image: {selfie_key}")
         
-        # Process both images
-        id_moderation = moderate_image(id_key, bucket_name)
-        selfie_moderation = moderate_image(selfie_key, bucket_name)
+        # Process both images concurrently
+        id_future = executor.submit(moderate_image, id_key, S3_BUCKET_NAME)
+        selfie_future = executor.submit(moderate_image, selfie_key, S3_BUCKET_NAME)
+        id_moderation = id_future.result()
+        selfie_moderation = selfie_future.result()
         
         # Combine results
         moderation_results = {
@@ -135,12 +160,12 @@ def lambda_handler(event, context):
         }
         
         # Update DynamoDB
-        update_dynamodb_record(verification_id, moderation_results)
+        update_dynamodb_record(verification_id, moderation_results, event.get('record_timestamp'))
         
         # Determine if any concerning labels were found
         concerning_labels = any(
-            label['Confidence'] > 80 
-            for labels in [id_moderation, selfie_moderation] 
+            label['Confidence'] > MIN_CONFIDENCE
+            for labels in [id_moderation, selfie_moderation]
             for label in labels
         )
         
@@ -0,0 +1,152 @@
+import boto3
+import logging
+import os
+import json
+import uuid
+import datetime
+import time
+from decimal import Decimal
+from botocore.config import Config
+from verification_record import MAX_IMAGE_BYTES, build_verification_record
+
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Initialize clients from a single session so they share one credential resolver
+session = boto3.session.Session()
+dynamodb = session.resource('dynamodb', config=boto_config)
+s3_client = session.client('s3', config=boto_config)
+
+# Get environment variables
+TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
+S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
+TTL_DAYS = int(os.environ.get('TTL_DAYS', 365))
+TTL_SECONDS = TTL_DAYS * 86400
+URL_EXPIRATION_SECONDS = int(os.environ.get('URL_EXPIRATION_SECONDS', 300))
+
+# Table handle reused across warm invocations
+table = dynamodb.Table(TABLE_NAME)
+
+# Image content types accepted for direct upload, mapped to file extensions
+ALLOWED_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png'
+}
+
+# Static CORS headers shared by every response
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key,Authorization',
+    'Access-Control-Allow-Methods': 'POST,OPTIONS',
+    'Access-Control-Allow-Credentials': 'true'
+}
+
+# Compact JSON encoder for response bodies, built once per container
+_ENCODE = json.JSONEncoder(separators=(',', ':')).encode
+
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+def lambda_handler(event, context):
+    """
+    Creates the verification record and returns presigned S3 POST forms so the
+    client can upload the ID and selfie images directly to S3. The S3 upload
+    notifications then start the verification workflow.
+    """
+    try:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event, default=str))
+
+        # Extract user email from Cognito authorizer context: JWT claims for
+        # HTTP API (v2), authorizer claims for REST API (v1)
+        authorizer = event.get('requestContext', {}).get('authorizer') or {}
+        claims = authorizer.get('jwt', {}).get('claims') or authorizer.get('claims') or {}
+        user_email = claims.get('email')
+
+        logger.info("User email from Cognito: %s", user_email)
+
+        body = event.get('body') or {}
+        if isinstance(body, str):
+            body = json.loads(body)
+
+        return handle_api_request(body, user_email)
+
+    except Exception as e:
+        logger.error("Unexpected error in lambda_handler: %s", e, exc_info=True)
+        return cors_response(500, {'error': "Internal server error"})
+
+def generate_upload_post(key, content_type):
+    """
+    Generate a presigned S3 POST bound to the given key and content type.
+    Unlike a presigned PUT, the policy also caps the object size, so S3
+    rejects oversized images before they are stored.
+    """
+    return s3_client.generate_presigned_post(
+        Bucket=S3_BUCKET_NAME,
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, MAX_IMAGE_BYTES]
+        ],
+        ExpiresIn=URL_EXPIRATION_SECONDS
+    )
+
+def handle_api_request(body, user_email):
+    try:
+        logger.info("Handling presigned upload request")
+
+        id_content_type = body.get('identityContentType', 'image/jpeg')
+        selfie_content_type = body.get('selfieContentType', 'image/jpeg')
+
+        for content_type in (id_content_type, selfie_content_type):
+            if content_type not in ALLOWED_CONTENT_TYPES:
+                logger.error("Unsupported content type: %s", content_type)
+                return cors_response(400, {'error': f"Unsupported content type: {content_type}"})
+
+        id_extension = ALLOWED_CONTENT_TYPES[id_content_type]
+        selfie_extension = ALLOWED_CONTENT_TYPES[selfie_content_type]
+
+        # Generate current timestamp
+        # POSIX seconds with microsecond precision, built from integer
+        # microseconds so no float is round-tripped through str()
+        now_us = time.time_ns() // 1000
+        timestamp = Decimal(now_us).scaleb(-6)
+        ttl = timestamp + TTL_SECONDS
+
+        # Generate UUID for tracking
+        verification_id = str(uuid.uuid4())
+
+        # Write the initial record before handing out the upload forms, so it
+        # exists when the S3 upload notifications arrive, and set up the S3
+        # keys with the appropriate extensions
+        item, id_key, selfie_key = build_verification_record(
+            verification_id, S3_BUCKET_NAME, id_extension, selfie_extension,
+            user_email, timestamp, ttl
+        )
+        table.put_item(Item=item)
+        logger.info("Initial record written to DynamoDB with VerificationId: %s", verification_id)
+
+        return cors_response(200, {
+            'verificationId': verification_id,
+            'status': 'PROCESSING',
+            'timestamp': datetime.datetime.fromtimestamp(now_us / 1e6, datetime.timezone.utc).isoformat(),
+            'userEmail': user_email,
+            'identityUpload': generate_upload_post(id_key, id_content_type),
+            'selfieUpload': generate_upload_post(selfie_key, selfie_content_type)
+        })
+
+    except Exception as e:
+        logger.error("Error in API request: %s", e, exc_info=True)
+        return cors_response(500, {'error': "Internal server error"})
+
+def cors_response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': _ENCODE(body)
+    }
@@ -1,46 +1,83 @@
 import json
-from PIL import Image
 import boto3
 import os
 from io import BytesIO
-import urllib.parse
 from decimal import Decimal
-from datetime import datetime, timezone
+import time
 import logging
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from PIL import Image
+from verification_record import MAX_IMAGE_BYTES, resized_key
+
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Get environment variables once per container; a missing one fails the
+# cold start instead of every invocation
+TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
 
 # Initialize clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=boto_config)
+dynamodb = boto3.resource('dynamodb', config=boto_config)
+table = dynamodb.Table(TABLE_NAME)
+
+# Thread pool reused across warm invocations for the two image pipelines
+executor = ThreadPoolExecutor(max_workers=2)
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-def get_s3_key_from_uri(s3_uri):
-    """
-    Extracts the S3 key from a full S3 URI
-    """
-    parsed = urlparse(s3_uri)
-    return parsed.path.lstrip('/')
+# Load Pillow's common format plugins (JPEG, PNG, BMP, ...) now rather than on
+# the first Image.open, so they are part of the SnapStart snapshot
+Image.preinit()
 
 def fetch_image(bucket, key):
     """
-    Fetches image from S3
+    Fetches image from S3 into an in-memory buffer. The object's size and
+    content type are checked from the GetObject response headers, so the body
+    of an ineligible object is never read.
     """
     logger.info(f"Fetching object: {key} from bucket: {bucket}")
     response = s3_client.get_object(Bucket=bucket, Key=key)
-    return response['Body'].read()
+    content_type = response.get('ContentType', '')
+    if not content_type.startswith('image/'):
+        response['Body'].close()
+        raise ValueError(f"Object {key} is not an image (ContentType: {content_type})")
+    if response['ContentLength'] > MAX_IMAGE_BYTES:
+        response['Body'].close()
+        raise ValueError("Image size exceeds 10MB limit")
+    return BytesIO(response['Body'].read())
 
-def resize_image(image_data):
+def resize_image(image_buffer):
     """
-    Resizes the image to half its original size
+    Validates the image format and dimensions from its header, then
+    resizes it to half its original size in the same pass.
+    JPEGs are decoded directly at the reduced scale via draft mode, so the
+    full-resolution bitmap is never materialized.
     """
-    image = Image.open(BytesIO(image_data))
+    image = Image.open(image_buffer)
+    
+    # Check image format
+    if image.format not in ['JPEG', 'JPG', 'PNG', 'BMP', 'TIFF']:
+        raise ValueError(f"Unsupported image format: {image.format}")
+    
+    # Check dimensions (e.g., max 4000x4000)
     width, height = image.size
-    resized = image.resize((width // 2, height // 2))
-    logger.info(f"Resized image from {width}x{height} to {width//2}x{height//2}")
-    return resized
+    if width > 4000 or height > 4000:
+        raise ValueError(f"Image dimensions ({width}x{height}) exceed maximum allowed (4000x4000)")
+    
+    target_size = (width // 2, height // 2)
+    image.draft('RGB', target_size)
+    image.thumbnail(target_size, Image.Resampling.BILINEAR)
+    logger.info(f"Resized image from {width}x{height} to {image.width}x{image.height}")
+    return image
 
 def upload_image(image, bucket, key):
     """
@@ -56,36 +93,47 @@ def upload_image(image, bucket, key):
         background.paste(image, mask=image.split()[-1])  # -1 is the alpha channel
         image = background
 
-    # Save as JPEG
-    image.save(buffer, format='JPEG', optimize=True, quality=70)
+    # Save as JPEG in a single encode pass (no Huffman optimization pass)
+    image.save(buffer, format='JPEG', quality=75, optimize=False, progressive=False, subsampling='4:2:0')
     buffer.seek(0)
     logger.info(f"Uploading resized image to {bucket}/{key}")
     response = s3_client.put_object(Bucket=bucket, Key=key, Body=buffer)
     logger.info(f"PutObject response: {response}")
     return f"s3://{bucket}/{key}"
 
-def update_dynamodb_record(verification_id, resized_paths):
+def get_record_timestamp(verification_id, record_timestamp=None):
+    """
+    Returns the record's Timestamp sort key, using the value passed in from
+    the Step Functions input when available instead of querying for it
+    """
+    if record_timestamp is not None:
+        return Decimal(str(record_timestamp))
+    
+    response = table.query(
+        KeyConditionExpression='VerificationId = :vid',
+        ProjectionExpression='#ts',
+        ExpressionAttributeNames={
+            '#ts': 'Timestamp'  # Timestamp is a reserved word in DynamoDB
+        },
+        ExpressionAttributeValues={
+            ':vid': verification_id
+        },
+        ScanIndexForward=False,
+        Limit=1
+    )
+    
+    if not response['Items']:
+        raise Exception(f"No record found for verification ID: {verification_id}")
+        
+    return response['Items'][0]['Timestamp']
+
+def update_dynamodb_record(verification_id, resized_paths, record_timestamp=None):
     """
     Updates the DynamoDB record with resized image paths and final status
     """
     try:
-        table = dynamodb.Table(os.environ['DYNAMODB_TABLE_NAME'])
-        
-        # Query to get the item's Timestamp
-        response = table.query(
-            KeyConditionExpression='VerificationId = :vid',
-            ExpressionAttributeValues={
-                ':vid': verification_id
-            },
-            ScanIndexForward=False,
-            Limit=1
-        )
-        
-        if not response['Items']:
-            raise Exception(f"No record found for verification ID: {verification_id}")
-            
-        timestamp = response['Items'][0]['Timestamp']
-        current_time = Decimal(str(datetime.now(timezone.utc).timestamp()))
+        timestamp = get_record_timestamp(verification_id, record_timestamp)
+        current_time = Decimal(time.time_ns() // 1000).scaleb(-6)
         
         # Update DynamoDB with resized image paths and final status
         update_expression = """
@@ -114,6 +162,8 @@ def update_dynamodb_record(verification_id, resized_paths):
                 'Timestamp': timestamp
             },
             UpdateExpression=update_expression,
+            # Never create a new item if the key does not match an existing record
+            ConditionExpression='attribute_exists(VerificationId)',
             ExpressionAttributeValues=expression_values,
             ExpressionAttributeNames=expression_names  # Add expression names
         )
@@ -125,28 +175,13 @@ def update_dynamodb_record(verification_id, resized_paths):
         logger.error(f"Error updating DynamoDB: {str(e)}")
         raise
 
-def update_failed_status(verification_id, error_message):
+def update_failed_status(verification_id, error_message, record_timestamp=None):
     """
     Updates DynamoDB record with failed status
     """
     try:
-        table = dynamodb.Table(os.environ['DYNAMODB_TABLE_NAME'])
-        
-        # Query to get the item's Timestamp
-        response = table.query(
-            KeyConditionExpression='VerificationId = :vid',
-            ExpressionAttributeValues={
-                ':vid': verification_id
-            },
-            ScanIndexForward=False,
-            Limit=1
-        )
-        
-        if not response['Items']:
-            raise Exception(f"No record found for verification ID: {verification_id}")
-            
-        timestamp = response['Items'][0]['Timestamp']
-        current_time = Decimal(str(datetime.now(timezone.utc).timestamp()))
+        timestamp = get_record_timestamp(verification_id, record_timestamp)
+        current_time = Decimal(time.time_ns() // 1000).scaleb(-6)
         
         table.update_item(
             Key={
@@ -159,6 +194,7 @@ def update_failed_status(verification_id, error_message):
                     ErrorMessage = :error,
                     #vs = :verification_status
             """,
+            ConditionExpression='attribute_exists(VerificationId)',
             ExpressionAttributeValues={
                 ':status': 'COMPLETED_FAILED',
                 ':updated': current_time,
@@ -175,69 +211,41 @@ def update_failed_status(verification_id, error_message):
     except Exception as e:
         logger.error(f"Error updating failed status in DynamoDB: {str(e)}")
 
-def validate_image(image_data):
+def process_image(bucket, key):
     """
-    Validates image size and format
+    Fetches, validates and resizes a single image, then uploads the resized
+    copy next to it and returns its S3 URI
     """
-    try:
-        image = Image.open(BytesIO(image_data))
-        
-        # Check image format
-        if image.format not in ['JPEG', 'JPG', 'PNG', 'BMP', 'TIFF']:
-            raise ValueError(f"Unsupported image format: {image.format}")
-        
-        # Check image size (e.g., max 10MB)
-        if len(image_data) > 10 * 1024 * 1024:
-            raise ValueError("Image size exceeds 10MB limit")
-        
-        # Check dimensions (e.g., max 4000x4000)
-        width, height = image.size
-        if width > 4000 or height > 4000:
-            raise ValueError(f"Image dimensions ({width}x{height}) exceed maximum allowed (4000x4000)")
-            
-        return True
-        
-    except Exception as e:
-        logger.error(f"Image validation failed: {str(e)}")
-        raise
+    image_buffer = fetch_image(bucket, key)
+    resized = resize_image(image_buffer)
+    return upload_image(resized, bucket, resized_key(key))
 
 def lambda_handler(event, context):
     """
     AWS Lambda handler for resizing images as part of Step Functions workflow
     """
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event, default=str))
         
         verification_id = event['verification_id']
-        bucket_name = os.environ.get('S3_BUCKET_NAME')
-        
-        if not bucket_name:
-            raise ValueError("S3_BUCKET_NAME environment variable is not set.")
-        
-        # Extract S3 keys from full URIs
-        id_key = get_s3_key_from_uri(event['id_key'])
-        selfie_key = get_s3_key_from_uri(event['selfie_key'])
         
-        # Process identity image
-        id_image_data = fetch_image(bucket_name, id_key)
-        validate_image(id_image_data)
-        resized_id = resize_image(id_image_data)
-        resized_id_key = f"resized_{id_key}"
-        resized_id_path = upload_image(resized_id, bucket_name, resized_id_key)
+        # The state machine passes bare S3 keys
+        id_key = event['id_key']
+        selfie_key = event['selfie_key']
         
-        # Process Selfie image
-        selfie_image_data = fetch_image(bucket_name, selfie_key)
-        validate_image(selfie_image_data)
-        resized_selfie = resize_image(selfie_image_data)
-        resized_selfie_key = f"resized_{selfie_key}"
-        resized_selfie_path = upload_image(resized_selfie, bucket_name, resized_selfie_key)
+        # Process identity and Selfie images concurrently
+        id_future = executor.submit(process_image, S3_BUCKET_NAME, id_key)
+        selfie_future = executor.submit(process_image, S3_BUCKET_NAME, selfie_key)
+        resized_id_path = id_future.result()
+        resized_selfie_path = selfie_future.result()
         
         # Update DynamoDB with resized image paths
         resized_paths = {
             'identity': resized_id_path,
             'selfie': resized_selfie_path
         }
-        update_dynamodb_record(verification_id, resized_paths)
+        update_dynamodb_record(verification_id, resized_paths, event.get('record_timestamp'))
         
         return {
             'statusCode': 200,
@@ -251,7 +259,7 @@ def lambda_handler(event, context):
         logger.error(f"Error processing resize operation: {error_message}")
         
         if 'verification_id' in locals():
-            update_failed_status(verification_id, error_message)
+            update_failed_status(verification_id, error_message, event.get('record_timestamp'))
             
         return {
             'statusCode': 500,
@@ -2,52 +2,61 @@ import boto3
 import json
 import logging
 import os
+import re
 from datetime import datetime
+from string import Template
+from botocore.config import Config
 
 # Set up logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Get environment variables once per container; a missing sender address
+# fails the cold start instead of every invocation
+FROM_EMAIL_ADDRESS = os.environ['FROM_EMAIL_ADDRESS']
 
 # Initialize clients
-ses_client = boto3.client('ses')
-dynamodb = boto3.resource('dynamodb')
+ses_client = boto3.client('ses', config=boto_config)
 
-def get_email_content(verification_id, success, details):
-    """
-    Generate email content based on verification results
-    """
-    timestamp = details.get('timestamp', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    error_details = details.get('error_details', {})
-    error_messages = details.get('error_messages', {})
-    validation_details = details.get('validation_details', {})
-    
-    # Common CSS styles
-    styles = """
-        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333333; }
-        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-        .header { background-color: #FF9900; color: black; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }
-        .content { background-color: #ffffff; padding: 20px; border: 1px solid #e2e8f0; border-radius: 0 0 5px 5px; }
-        .footer { text-align: center; margin-top: 20px; font-size: 12px; color: #718096; }
-        .result-box { background-color: #f7fafc; border: 1px solid #e2e8f0; border-radius: 5px; padding: 15px; margin: 15px 0; }
-        .success { color: #48bb78; }
-        .failure { color: #f56565; }
-        .button { display: inline-block; padding: 10px 20px; background-color: #FF9900; color: black !important; text-decoration: none; border-radius: 5px; margin-top: 15px; }
-        .details { margin: 15px 0; }
-        .detail-row { display: flex; justify-content: space-between; margin: 5px 0; }
-        .label { color: #4a5568; }
-        .value { font-weight: bold; }
-        .validation-section { margin-top: 15px; padding: 10px; background-color: #f8f9fa; }
-        a, a:link, a:visited, a:hover, a:active { color: #333333 !important; text-decoration: none; }
-        span, span.im { color: #333333 !important; }
-        * { color: inherit; }
-    """
+# Whether to send a plain-text alternative alongside the HTML body
+SEND_TEXT_ALTERNATIVE = os.environ.get('SEND_TEXT_ALTERNATIVE', 'true').lower() == 'true'
 
-    if success:
-        html_content = f"""
+# Common CSS styles, shared by every email and built once per container.
+# Whitespace is collapsed so every message carries the smaller stylesheet.
+EMAIL_STYLES = re.sub(r'\s+', ' ', """
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333333; }
+    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+    .header { background-color: #FF9900; color: black; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }
+    .content { background-color: #ffffff; padding: 20px; border: 1px solid #e2e8f0; border-radius: 0 0 5px 5px; }
+    .footer { text-align: center; margin-top: 20px; font-size: 12px; color: #718096; }
+    .result-box { background-color: #f7fafc; border: 1px solid #e2e8f0; border-radius: 5px; padding: 15px; margin: 15px 0; }
+    .success { color: #48bb78; }
+    .failure { color: #f56565; }
+    .button { display: inline-block; padding: 10px 20px; background-color: #FF9900; color: black !important; text-decoration: none; border-radius: 5px; margin-top: 15px; }
+    .details { margin: 15px 0; }
+    .detail-row { display: flex; justify-content: space-between; margin: 5px 0; }
+    .label { color: #4a5568; }
+    .value { font-weight: bold; }
+    .validation-section { margin-top: 15px; padding: 10px; background-color: #f8f9fa; }
+    a, a:link, a:visited, a:hover, a:active { color: #333333 !important; text-decoration: none; }
+    span, span.im { color: #333333 !important; }
+    * { color: inherit; }
+""").strip()
+
+# HTML bodies, with the styles substituted once per container. Only the
+# per-verification fields are filled in for each email.
+SUCCESS_HTML = Template(f"""
         <!DOCTYPE html>
         <html>
         <head>
-            <style>{styles}</style>
+            <style>{EMAIL_STYLES}</style>
         </head>
         <body>
             <div class="container">
@@ -62,11 +71,11 @@ def get_email_content(verification_id, success, details):
                         <div class="details">
                             <div class="detail-row">
                                 <span class="label">Verification ID: </span>
-                                <span class="value">{verification_id}</span>
+                                <span class="value">$verification_id</span>
                             </div>
                             <div class="detail-row">
                                 <span class="label">Timestamp: </span>
-                                <span class="value">{timestamp}</span>
+                                <span class="value">$timestamp</span>
                             </div>
                         </div>
                     </div>
@@ -84,26 +93,13 @@ def get_email_content(verification_id, success, details):
             </div>
         </body>
         </html>
-        """
-    else:
-        # Construct failure details
-        moderation_status = error_details.get('moderation', {}).get('Status', 'N/A')
-        id_analysis_status = error_details.get('id_analysis', {}).get('Status', 'N/A')
-        
-        # Get validation details for ID analysis
-        id_validation = validation_details.get('id_analysis', {})
-        validation_issues = []
-        
-        if id_validation:
-            for field, data in id_validation.items():
-                if not data.get('present') or data.get('confidence', 0) < 90:
-                    validation_issues.append(f"{field.replace('_', ' ').title()}: Invalid or low confidence")
+        """)
 
-        html_content = f"""
+FAILURE_HTML = Template(f"""
         <!DOCTYPE html>
         <html>
         <head>
-            <style>{styles}</style>
+            <style>{EMAIL_STYLES}</style>
         </head>
         <body>
             <div class="container">
@@ -118,11 +114,11 @@ def get_email_content(verification_id, success, details):
                         <div class="details">
                             <div class="detail-row">
                                 <span class="label">Verification ID: </span>
-                                <span class="value">{verification_id}</span>
+                                <span class="value">$verification_id</span>
                             </div>
                             <div class="detail-row">
                                 <span class="label">Timestamp: </span>
-                                <span class="value">{timestamp}</span>
+                                <span class="value">$timestamp</span>
                             </div>
                         </div>
                     </div>
@@ -130,20 +126,10 @@ def get_email_content(verification_id, success, details):
                     <div class="validation-section">
                         <h3>Verification Results:</h3>
                         <ul>
-                            <li>Moderation Check: {moderation_status}</li>
-                            <li>ID Analysis: {id_analysis_status}</li>
+                            <li>Moderation Check: $moderation_status</li>
+                            <li>ID Analysis: $id_analysis_status</li>
                         </ul>
-                    """
-
-        if validation_issues:
-            html_content += """
-                        <h3>Validation Issues:</h3>
-                        <ul>
-                            """ + "".join([f"<li>{issue}</li>" for issue in validation_issues]) + """
-                        </ul>
-            """
-
-        html_content += f"""
+                    $validation_issues
                     </div>
 
                     <p>Please ensure:</p>
@@ -160,10 +146,61 @@ def get_email_content(verification_id, success, details):
             </div>
         </body>
         </html>
-        """
+        """)
+
+VALIDATION_ISSUES_HTML = Template("""
+                        <h3>Validation Issues:</h3>
+                        <ul>
+                            $items
+                        </ul>
+            """)
 
-    # Plain text version
-    plain_text = f"""
+def get_email_content(verification_id, success, details):
+    """
+    Generate email content based on verification results
+    """
+    timestamp = details.get('timestamp', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    error_details = details.get('error_details', {})
+    error_messages = details.get('error_messages', {})
+    validation_details = details.get('validation_details', {})
+    
+    if success:
+        html_content = SUCCESS_HTML.substitute(
+            verification_id=verification_id,
+            timestamp=timestamp
+        )
+    else:
+        # Construct failure details
+        moderation_status = error_details.get('moderation', {}).get('Status', 'N/A')
+        id_analysis_status = error_details.get('id_analysis', {}).get('Status', 'N/A')
+        
+        # Get validation details for ID analysis
+        id_validation = validation_details.get('id_analysis', {})
+        validation_issues = []
+        
+        if id_validation:
+            for field, data in id_validation.items():
+                if not data.get('present') or data.get('confidence', 0) < 90:
+                    validation_issues.append(f"{field.replace('_', ' ').title()}: Invalid or low confidence")
+
+        validation_issues_html = ''
+        if validation_issues:
+            validation_issues_html = VALIDATION_ISSUES_HTML.substitute(
+                items="".join(f"<li>{issue}</li>" for issue in validation_issues)
+            )
+
+        html_content = FAILURE_HTML.substitute(
+            verification_id=verification_id,
+            timestamp=timestamp,
+            moderation_status=moderation_status,
+            id_analysis_status=id_analysis_status,
+            validation_issues=validation_issues_html
+        )
+
+    # Plain text version, only built when it is sent
+    plain_text = None
+    if SEND_TEXT_ALTERNATIVE:
+        plain_text = f"""
     ID Verification {'Successful' if success else 'Failed'}
     
     Verification ID: {verification_id}
@@ -177,7 +214,8 @@ def get_email_content(verification_id, success, details):
 
 def lambda_handler(event, context):
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event, default=str))
         
         verification_id = event['verification_id']
         success = event['success']
@@ -189,8 +227,18 @@ def lambda_handler(event, context):
             
         subject, plain_text, html_content = get_email_content(verification_id, success, details)
         
+        body = {
+            'Html': {
+                'Data': html_content
+            }
+        }
+        if plain_text:
+            body['Text'] = {
+                'Data': plain_text
+            }
+        
         response = ses_client.send_email(
-            Source=os.environ['FROM_EMAIL_ADDRESS'],
+            Source=FROM_EMAIL_ADDRESS,
             Destination={
                 'ToAddresses': [user_email]
             },
@@ -198,18 +246,11 @@ def lambda_handler(event, context):
                 'Subject': {
                     'Data': subject
                 },
-                'Body': {
-                    'Text': {
-                        'Data': plain_text
-                    },
-                    'Html': {
-                        'Data': html_content
-                    }
-                }
+                'Body': body
             }
         )
         
-        logger.info(f"Email sent successfully to {user_email}. MessageId: {response['MessageId']}")
+        logger.info("Email sent successfully to %s. MessageId: %s", user_email, response['MessageId'])
         
         return {
             'statusCode': 200,
@@ -220,7 +261,7 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
+        logger.error("Error sending email: %s", e)
         return {
             'statusCode': 500,
             'verification_id': verification_id if 'verification_id' in locals() else 'UNKNOWN',
@@ -2,95 +2,167 @@ import boto3
 import json
 import logging
 import os
+import re
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from decimal import Decimal
-from urllib.parse import urlparse
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
-# Initialize clients
-dynamodb = boto3.resource('dynamodb')
-sfn_client = boto3.client('stepfunctions')
-table = dynamodb.Table(os.environ['DYNAMODB_TABLE_NAME'])
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Get environment variables once per container; a missing one fails the
+# cold start instead of every invocation
+TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+STATE_MACHINE_ARN = os.environ['STATE_MACHINE_ARN']
+
+# Initialize clients from a single session so they share one credential resolver
+session = boto3.session.Session()
+dynamodb = session.resource('dynamodb', config=boto_config)
+sfn_client = session.client('stepfunctions', config=boto_config)
+table = dynamodb.Table(TABLE_NAME)
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# DynamoDB update expression for recording an upload, with its attribute
+# names per file type; the expression string itself is the same for both
+_UPLOAD_EXPR = (
+    "SET #flag = :true, "
+    "#uploaded_at = :time, "
+    "LastUpdated = :updated, "
+    "#s3_key = :s3_key"
+)
+_UPLOAD_NAMES = {
+    file_type: {
+        '#flag': f"{file_type}Uploaded",
+        '#uploaded_at': f"{file_type}UploadedAt",
+        '#s3_key': f"{file_type}S3Key"
+    }
+    for file_type in ('identity', 'selfie')
+}
 
-def get_verification_id_from_key(key):
-    """Extract verification ID from S3 key"""
-    return key.split('/')[-1].split('.')[0]
+# Timestamp sort keys of recently seen verifications, kept across warm
+# invocations so the second upload event handled by this container can skip
+# the lookup query; the sort key never changes once the record is written
+_TIMESTAMP_CACHE = OrderedDict()
+_TIMESTAMP_CACHE_MAX = 256
+
+# Upload keys look like "<prefix>/<verification_id>.<extension>"
+_KEY_RE = re.compile(r'^([^/]+)/([^/.]+)(?:\.([^/.]*))?$')
 
 def get_file_info_from_key(key):
-    """Extract verification ID and extension from S3 key"""
-    # Split path into parts
-    parts = key.split('/')
-    # Get filename from last part
-    filename = parts[-1]
-    # Split filename into name and extension
-    name_parts = filename.rsplit('.', 1)
-    
+    """
+    Extract verification ID and extension from S3 key, or return None if the
+    key is not laid out like an upload
+    """
+    match = _KEY_RE.match(key)
+    if not match:
+        return None
+    prefix, verification_id, extension = match.groups()
     return {
-        'verification_id': name_parts[0],
-        'extension': name_parts[1] if len(name_parts) > 1 else '',
-        'type': 'identity' if parts[0] == 'identity' else 'selfie'
+        'verification_id': verification_id,
+        'extension': extension or '',
+        'type': 'identity' if prefix == 'identity' else 'selfie'
     }
 
+def get_record_timestamp(verification_id):
+    """
+    Return the Timestamp sort key of the verification record, or None if no
+    record exists yet
+    """
+    timestamp = _TIMESTAMP_CACHE.get(verification_id)
+    if timestamp is not None:
+        _TIMESTAMP_CACHE.move_to_end(verification_id)
+        return timestamp
+
+    response = table.query(
+        KeyConditionExpression='VerificationId = :vid',
+        ProjectionExpression='#ts',
+        ExpressionAttributeNames={
+            '#ts': 'Timestamp'  # Timestamp is a reserved word in DynamoDB
+        },
+        ExpressionAttributeValues={
+            ':vid': verification_id
+        },
+        ScanIndexForward=False,
+        Limit=1
+    )
+
+    if not response['Items']:
+        return None
+
+    timestamp = response['Items'][0]['Timestamp']
+    _TIMESTAMP_CACHE[verification_id] = timestamp
+    if len(_TIMESTAMP_CACHE) > _TIMESTAMP_CACHE_MAX:
+        _TIMESTAMP_CACHE.popitem(last=False)
+    return timestamp
+
 def update_upload_status(verification_id, file_type, s3_key):
-    """Update DynamoDB record with file upload status"""
+    """
+    Update DynamoDB record with file upload status.
+    Returns the updated record, or None if no record exists yet or this
+    file was already recorded by an earlier delivery of the same S3 event.
+    """
     try:
-        # First try to get existing record
-        response = table.query(
-            KeyConditionExpression='VerificationId = :vid',
-            ExpressionAttributeValues={
-                ':vid': verification_id
-            },
-            ScanIndexForward=False,
-            Limit=1
-        )
-
-        current_time = Decimal(str(datetime.now(timezone.utc).timestamp()))
+        # Look up the record's Timestamp sort key
+        timestamp = get_record_timestamp(verification_id)
+        if timestamp is None:
+            return None
+
+        # POSIX seconds with microsecond precision, built from integer
+        # microseconds so no float is round-tripped through str()
+        current_time = Decimal(time.time_ns() // 1000).scaleb(-6)
         
-        if response['Items']:
-            # Record exists, update it
-            item = response['Items'][0]
-            update_expr = f"""
-                SET {file_type}Uploaded = :true, 
-                    {file_type}UploadedAt = :time, 
-                    LastUpdated = :updated,
-                    {file_type}S3Key = :s3_key
-            """
-            expr_values = {
-                ':true': True,
-                ':time': current_time,
-                ':updated': current_time,
-                ':s3_key': s3_key
-            }
-            
-            table.update_item(
+        expr_values = {
+            ':true': True,
+            ':false': False,
+            ':time': current_time,
+            ':updated': current_time,
+            ':s3_key': s3_key
+        }
+        
+        # Return the record as written, so the caller sees both upload flags
+        # from this update and needs no further read to start the workflow.
+        # The flag is only set if it is not set yet, so of two concurrent or
+        # repeated events exactly one sees both flags become true.
+        try:
+            response = table.update_item(
                 Key={
                     'VerificationId': verification_id,
-                    'Timestamp': item['Timestamp']
+                    'Timestamp': timestamp
                 },
-                UpdateExpression=update_expr,
-                ExpressionAttributeValues=expr_values
+                UpdateExpression=_UPLOAD_EXPR,
+                ConditionExpression=(
+                    'attribute_exists(VerificationId) AND '
+                    '(attribute_not_exists(#flag) OR #flag = :false)'
+                ),
+                ExpressionAttributeNames=_UPLOAD_NAMES[file_type],
+                ExpressionAttributeValues=expr_values,
+                ReturnValues='ALL_NEW'
             )
-            
-            # Check if both files are now present
-            return (
-                item.get('identityUploaded', False) or file_type == 'identity',
-                item.get('selfieUploaded', False) or file_type == 'selfie'
-            )
-            
-        return False, False
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Drop the cached key too, in case the record itself is gone
+            _TIMESTAMP_CACHE.pop(verification_id, None)
+            logger.info("%s upload already recorded for verification ID: %s", file_type, verification_id)
+            return None
+        return response['Attributes']
 
     except Exception as e:
-        logger.error(f"Error updating upload status: {str(e)}")
+        logger.error("Error updating upload status: %s", e)
         raise
 
 def start_state_machine(verification_id, dynamo_record):
     """Start Step Functions state machine"""
     try:
-        state_machine_arn = os.environ['STATE_MACHINE_ARN']
-        bucket_name = os.environ['S3_BUCKET_NAME']
-        
         # Get the actual S3 keys from the DynamoDB record
         id_key = dynamo_record.get('identityS3Key')
         selfie_key = dynamo_record.get('selfieS3Key')
@@ -100,91 +172,85 @@ def start_state_machine(verification_id, dynamo_record):
         
         input_data = {
             "verification_id": verification_id,
-            "id_key": f"s3://{bucket_name}/{id_key}",
-            "selfie_key": f"s3://{bucket_name}/{selfie_key}",
+            # Bare object keys; every task reads from the upload bucket
+            "id_key": id_key,
+            "selfie_key": selfie_key,
             "user_email": dynamo_record.get('UserEmail'),
+            # Sort key of the verification record, so downstream tasks can
+            # address the item directly instead of querying for it
+            "record_timestamp": str(dynamo_record['Timestamp']),
             "status": "PROCESSING",
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "success": True
         }
         
-        response = sfn_client.start_execution(
-            stateMachineArn=state_machine_arn,
-            input=json.dumps(input_data)
-        )
+        # Name the execution after the verification, so Step Functions itself
+        # rejects a second start for the same verification
+        execution_name = f"v-{verification_id}"
+        try:
+            response = sfn_client.start_execution(
+                stateMachineArn=STATE_MACHINE_ARN,
+                name=execution_name,
+                input=json.dumps(input_data, separators=(',', ':'))
+            )
+        except sfn_client.exceptions.ExecutionAlreadyExists:
+            logger.info("State machine already started for verification ID: %s", verification_id)
+            return f"{STATE_MACHINE_ARN.replace(':stateMachine:', ':execution:', 1)}:{execution_name}"
         
-        logger.info(f"Started state machine for verification ID: {verification_id}")
+        logger.info("Started state machine for verification ID: %s", verification_id)
         return response['executionArn']
         
     except Exception as e:
-        logger.error(f"Error starting state machine: {str(e)}")
+        logger.error("Error starting state machine: %s", e)
         raise
 
 def lambda_handler(event, context):
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
-        
         # Get S3 event details
         record = event['Records'][0]['s3']
         bucket = record['bucket']['name']
         key = record['object']['key']
+        logger.debug("Received S3 event for s3://%s/%s", bucket, key)
         
         # Get file information including extension
         file_info = get_file_info_from_key(key)
+        if file_info is None:
+            logger.warning("Ignoring S3 key outside the upload layout: %s", key)
+            return {
+                'statusCode': 200,
+                'message': 'Ignored'
+            }
         verification_id = file_info['verification_id']
         file_type = file_info['type']
         
-        logger.info(f"Processing {file_type} upload for verification ID: {verification_id}")
+        logger.info("Processing %s upload for verification ID: %s", file_type, verification_id)
         
         # Update upload status and check if both files are present
-        id_present, selfie_present = update_upload_status(verification_id, file_type, key)
+        item = update_upload_status(verification_id, file_type, key)
         
         # If both files are present, start the state machine
-        if id_present and selfie_present:
-            logger.info(f"Both files present for verification ID: {verification_id}")
-            
-            # Get the record from DynamoDB
-            response = table.query(
-                KeyConditionExpression='VerificationId = :vid',
-                ExpressionAttributeValues={
-                    ':vid': verification_id
-                },
-                ScanIndexForward=False,
-                Limit=1
-            )
-            
-            if not response['Items']:
-                raise Exception(f"No record found for verification ID: {verification_id}")
+        if item and item.get('identityUploaded') and item.get('selfieUploaded'):
+            logger.info("Both files present for verification ID: %s", verification_id)
             
             # Start the state machine with actual file paths from DynamoDB
-            execution_arn = start_state_machine(
-                verification_id,
-                response['Items'][0]
-            )
+            execution_arn = start_state_machine(verification_id, item)
             
+            # S3 discards the result of the invocation, so nothing is encoded
             return {
                 'statusCode': 200,
-                'body': json.dumps({
-                    'message': 'State machine started',
-                    'verificationId': verification_id,
-                    'executionArn': execution_arn
-                })
+                'verificationId': verification_id,
+                'executionArn': execution_arn
             }
         else:
-            logger.info(f"Waiting for other file for verification ID: {verification_id}")
+            logger.info("Waiting for other file for verification ID: %s", verification_id)
             return {
                 'statusCode': 200,
-                'body': json.dumps({
-                    'message': 'File uploaded, waiting for pair',
-                    'verificationId': verification_id
-                })
+                'verificationId': verification_id
             }
             
     except Exception as e:
-        logger.error(f"Error processing S3 event: {str(e)}")
+        logger.error("Error processing S3 event: %s", e)
         return {
             'statusCode': 500,
-            'body': json.dumps({
-                'error': str(e)
-            })
+            'error': str(e)
         }
@@ -4,41 +4,67 @@ import os
 import json
 import uuid
 import datetime
-import base64
+import time
+import binascii
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from botocore.config import Config
+from verification_record import build_verification_record
 
-# Initialize clients
-dynamodb = boto3.resource('dynamodb')
-s3_client = boto3.client('s3')
+# Keep HTTPS connections alive across warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Initialize clients from a single session so they share one credential resolver
+session = boto3.session.Session()
+dynamodb = session.resource('dynamodb', config=boto_config)
+s3_client = session.client('s3', config=boto_config)
+
+# Thread pool reused across warm invocations for concurrent S3 and DynamoDB writes
+executor = ThreadPoolExecutor(max_workers=4)
 
 # Get environment variables
 TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
 TTL_DAYS = int(os.environ.get('TTL_DAYS', 365))
+TTL_SECONDS = TTL_DAYS * 86400
+
+# Table handle reused across warm invocations
+table = dynamodb.Table(TABLE_NAME)
+
+# Static CORS headers shared by every response
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key,Authorization',
+    'Access-Control-Allow-Methods': 'POST,OPTIONS',
+    'Access-Control-Allow-Credentials': 'true'
+}
+
+# Compact JSON encoder for response bodies, built once per container
+_ENCODE = json.JSONEncoder(separators=(',', ':')).encode
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 def lambda_handler(event, context):
     try:
-        # Log only non-sensitive parts of the event
-        safe_event = {k: v for k, v in event.items() if k != 'body'}
-        logger.info(f"Received event: {json.dumps(safe_event)}")
-
-        # Extract user email from Cognito authorizer context
-        user_email = None
-        if 'requestContext' in event:
-            if 'authorizer' in event['requestContext']:
-                if 'jwt' in event['requestContext']['authorizer']:
-                    # For HTTP API (v2)
-                    claims = event['requestContext']['authorizer']['jwt']['claims']
-                    user_email = claims.get('email')
-                elif 'claims' in event['requestContext']['authorizer']:
-                    # For REST API (v1)
-                    claims = event['requestContext']['authorizer']['claims']
-                    user_email = claims.get('email')
-
-        logger.info(f"User email from Cognito: {user_email}")
+        # Log only non-sensitive parts of the event, and the body's size
+        # rather than the base64 images themselves
+        if logger.isEnabledFor(logging.DEBUG):
+            safe_event = {k: v for k, v in event.items() if k != 'body'}
+            logger.debug("Received event: %s (body size: %d)",
+                         json.dumps(safe_event, default=str), len(event.get('body') or ''))
+
+        # Extract user email from Cognito authorizer context: JWT claims for
+        # HTTP API (v2), authorizer claims for REST API (v1)
+        authorizer = event.get('requestContext', {}).get('authorizer') or {}
+        claims = authorizer.get('jwt', {}).get('claims') or authorizer.get('claims') or {}
+        user_email = claims.get('email')
+
+        logger.info("User email from Cognito: %s", user_email)
 
         # Check if it's an API Gateway event
         if 'body' in event:
@@ -51,21 +77,22 @@ def lambda_handler(event, context):
             return cors_response(400, {'error': "Missing body in request"})
 
     except Exception as e:
-        logger.error(f"Unexpected error in lambda_handler: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in lambda_handler: %s", e, exc_info=True)
         return cors_response(500, {'error': "Internal server error"})
 
 def get_file_info_from_base64(base64_data):
     """Extract file type from base64 data"""
-    # Check if the base64 string contains metadata
-    if ';base64,' in base64_data:
-        metadata, base64_string = base64_data.split(';base64,')
-        if metadata.startswith('data:'):
-            mime_type = metadata.split(':')[1]
-            extension = mime_type.split('/')[-1]
+    # Check if the base64 string starts with data URL metadata; only the
+    # prefix is searched, so a multi-MB payload is not scanned for it
+    if base64_data.startswith('data:'):
+        index = base64_data.find(';base64,', 0, 256)
+        if index != -1:
+            mime_type = base64_data[5:index]
+            extension = mime_type.rsplit('/', 1)[-1]
             # Convert common mime types to extensions
             if extension == 'jpeg':
                 extension = 'jpg'
-            return base64_string, extension
+            return base64_data[index + 8:], extension
     
     # If no metadata, return the original string and default to jpg
     return base64_data, 'jpg'
@@ -81,9 +108,11 @@ def handle_api_request(body, user_email):
             raise KeyError('Missing selfie or identity in the request body')
 
         # Generate current timestamp
-        current_time = datetime.datetime.now(datetime.timezone.utc)
-        timestamp = Decimal(str(current_time.timestamp()))
-        ttl = Decimal(str((current_time + datetime.timedelta(days=TTL_DAYS)).timestamp()))
+        # POSIX seconds with microsecond precision, built from integer
+        # microseconds so no float is round-tripped through str()
+        now_us = time.time_ns() // 1000
+        timestamp = Decimal(now_us).scaleb(-6)
+        ttl = timestamp + TTL_SECONDS
 
         # Generate UUID for tracking
         verification_id = str(uuid.uuid4())
@@ -92,71 +121,64 @@ def handle_api_request(body, user_email):
         id_base64, id_extension = get_file_info_from_base64(identity)
         selfie_base64, selfie_extension = get_file_info_from_base64(selfie)
 
-        # Convert base64 to bytes
-        id_bytes = base64.b64decode(id_base64)
-        selfie_bytes = base64.b64decode(selfie_base64)
-
-        # Set up S3 keys with appropriate extensions
-        id_key = f"identity/{verification_id}.{id_extension}"
-        selfie_key = f"selfie/{verification_id}.{selfie_extension}"
-        id_resized_key = f"resized_id/{verification_id}.{id_extension}"
-        selfie_resized_key = f"resized_selfie/{verification_id}.{selfie_extension}"
-
-        # Upload original images to S3 with content type
-        s3_client.put_object(
+        # Write the initial record, and set up the S3 keys with the appropriate
+        # extensions, while the images are decoded. The record must exist
+        # before the uploads start, as the trigger Lambda ignores S3 events
+        # for a verification it has no record of
+        item, id_key, selfie_key = build_verification_record(
+            verification_id, S3_BUCKET_NAME, id_extension, selfie_extension,
+            user_email, timestamp, ttl
+        )
+        record_write = executor.submit(table.put_item, Item=item)
+
+        # Convert base64 to bytes, releasing each encoded payload as soon as it
+        # is decoded so only one copy of each image stays resident
+        id_bytes = binascii.a2b_base64(id_base64)
+        del identity, id_base64
+        body.pop('identity', None)
+        selfie_bytes = binascii.a2b_base64(selfie_base64)
+        del selfie, selfie_base64
+        body.pop('selfie', None)
+
+        record_write.result()
+        logger.info("Initial record written to DynamoDB with VerificationId: %s", verification_id)
+
+        # Upload original images to S3 with content type, concurrently
+        id_upload = executor.submit(
+            s3_client.put_object,
             Bucket=S3_BUCKET_NAME, 
             Key=id_key, 
             Body=id_bytes,
             ContentType=f'image/{id_extension}'
         )
-        s3_client.put_object(
+        selfie_upload = executor.submit(
+            s3_client.put_object,
             Bucket=S3_BUCKET_NAME, 
             Key=selfie_key, 
             Body=selfie_bytes,
             ContentType=f'image/{selfie_extension}'
         )
-        logger.info(f"Files uploaded to S3: {id_key}, {selfie_key}")
-
-        # Write initial record to DynamoDB
-        table = dynamodb.Table(TABLE_NAME)
-        item = {
-            'VerificationId': verification_id,
-            'Status': 'PROCESSING',
-            'Timestamp': timestamp,
-            'TTL': ttl,
-            'UserEmail': user_email,
-            'IdentificationS3Key': f"s3://{S3_BUCKET_NAME}/{id_key}",
-            'IdentificationImageResizedS3Key': f"s3://{S3_BUCKET_NAME}/{id_resized_key}",
-            'SelfieImageS3Key': f"s3://{S3_BUCKET_NAME}/{selfie_key}",
-            'SelfieImageResizedS3Key': f"s3://{S3_BUCKET_NAME}/{selfie_resized_key}",
-            'IdentificationExtension': id_extension,
-            'SelfieExtension': selfie_extension
-        }
-        table.put_item(Item=item)
-        logger.info(f"Initial record written to DynamoDB with VerificationId: {verification_id}")
+        id_upload.result()
+        selfie_upload.result()
+        logger.info("Files uploaded to S3: %s, %s", id_key, selfie_key)
 
         return cors_response(200, {
             'verificationId': verification_id,
             'status': 'PROCESSING',
-            'timestamp': current_time.isoformat(),
+            'timestamp': datetime.datetime.fromtimestamp(now_us / 1e6, datetime.timezone.utc).isoformat(),
             'userEmail': user_email
         })
 
     except KeyError as e:
-        logger.error(f"Missing required field: {str(e)}")
+        logger.error("Missing required field: %s", e)
         return cors_response(400, {'error': f"Missing required field: {str(e)}"})
     except Exception as e:
-        logger.error(f"Error in API request: {str(e)}", exc_info=True)
+        logger.error("Error in API request: %s", e, exc_info=True)
         return cors_response(500, {'error': "Internal server error"})
 
 def cors_response(status_code, body):
     return {
         'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Api-Key,Authorization',
-            'Access-Control-Allow-Methods': 'POST,OPTIONS',
-            'Access-Control-Allow-Credentials': 'true'
-        },
-        'body': json.dumps(body)
+        'headers': CORS_HEADERS,
+        'body': _ENCODE(body)
     }
\ No newline at end of file
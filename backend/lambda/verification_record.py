@@ -0,0 +1,37 @@
+"""
+Helpers shared by the Lambdas that create verification records and the
+Lambdas that process the images those records point at
+"""
+
+# Largest image accepted for upload and resizing
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+def resized_key(key):
+    """
+    Returns the S3 key the resize Lambda writes the resized copy of an image to
+    Example: "identity/abc.jpg" -> "resized_identity/abc.jpg"
+    """
+    return f"resized_{key}"
+
+def build_verification_record(verification_id, bucket, id_extension, selfie_extension,
+                              user_email, timestamp, ttl):
+    """
+    Builds the initial record of a verification. Returns the record together
+    with the S3 keys its ID and selfie images are uploaded to.
+    """
+    id_key = f"identity/{verification_id}.{id_extension}"
+    selfie_key = f"selfie/{verification_id}.{selfie_extension}"
+    item = {
+        'VerificationId': verification_id,
+        'Status': 'PROCESSING',
+        'Timestamp': timestamp,
+        'TTL': ttl,
+        'UserEmail': user_email,
+        'IdentificationS3Key': f"s3://{bucket}/{id_key}",
+        'IdentificationImageResizedS3Key': f"s3://{bucket}/{resized_key(id_key)}",
+        'SelfieImageS3Key': f"s3://{bucket}/{selfie_key}",
+        'SelfieImageResizedS3Key': f"s3://{bucket}/{resized_key(selfie_key)}",
+        'IdentificationExtension': id_extension,
+        'SelfieExtension': selfie_extension
+    }
+    return item, id_key, selfie_key
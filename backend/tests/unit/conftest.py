@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The Lambda handlers read their configuration from the environment at import
+# time and are deployed from the lambda directory, not as a package
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("DYNAMODB_TABLE_NAME", "VerificationTable")
+os.environ.setdefault("S3_BUCKET_NAME", "upload-bucket")
+os.environ.setdefault("STATE_MACHINE_ARN", "arn:aws:states:us-east-1:123456789012:stateMachine:StateMachine")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "lambda"))
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+import id_delete_lambda
+
+EVENT = {"queryStringParameters": {"verificationId": "abc"}}
+
+ITEM = {
+    "VerificationId": "abc",
+    "Timestamp": 1,
+    "IdentificationS3Key": "s3://upload-bucket/identity/abc.jpg",
+    "IdentificationImageResizedS3Key": "s3://upload-bucket/resized_identity/abc.jpg",
+    "SelfieImageS3Key": "s3://upload-bucket/selfie/abc.png",
+    "SelfieImageResizedS3Key": "s3://upload-bucket/resized_selfie/abc.png",
+}
+
+
+def run_delete(delete_objects_response=None, delete_item_error=None):
+    """Invokes the handler against mocked clients and returns the response and mocks"""
+    calls = mock.Mock()
+    calls.table.query.return_value = {"Items": [ITEM]}
+    calls.s3.delete_objects.return_value = delete_objects_response or {}
+    calls.table.delete_item.side_effect = delete_item_error
+    with mock.patch.object(id_delete_lambda, "table", calls.table), \
+            mock.patch.object(id_delete_lambda, "s3", calls.s3):
+        response = id_delete_lambda.lambda_handler(EVENT, None)
+    return response, calls
+
+
+def test_deletes_recorded_objects_before_the_item():
+    response, calls = run_delete()
+
+    assert response["statusCode"] == 200
+    assert [call[0] for call in calls.mock_calls] == [
+        "table.query", "s3.delete_objects", "table.delete_item"
+    ]
+    assert calls.s3.delete_objects.call_args.kwargs["Delete"]["Objects"] == [
+        {"Key": "identity/abc.jpg"},
+        {"Key": "resized_identity/abc.jpg"},
+        {"Key": "selfie/abc.png"},
+        {"Key": "resized_selfie/abc.png"},
+    ]
+
+
+def test_keeps_the_item_when_objects_fail_to_delete():
+    response, calls = run_delete(delete_objects_response={
+        "Errors": [{"Key": "selfie/abc.png", "Code": "AccessDenied", "Message": "Access Denied"}]
+    })
+
+    assert response["statusCode"] == 500
+    calls.table.delete_item.assert_not_called()
+
+
+def test_reports_an_item_that_fails_to_delete():
+    error = ClientError({"Error": {"Code": "InternalServerError", "Message": "boom"}}, "DeleteItem")
+    response, calls = run_delete(delete_item_error=error)
+
+    assert response["statusCode"] == 500
+    assert "could not be removed" in response["body"]
+    calls.s3.delete_objects.assert_called_once()
@@ -0,0 +1,42 @@
+from unittest import mock
+
+import id_presign_lambda
+from verification_record import MAX_IMAGE_BYTES
+
+
+def request_upload(body):
+    """Runs the API request against mocked clients and returns the response and mocks"""
+    with mock.patch.object(id_presign_lambda, "table") as table, \
+            mock.patch.object(id_presign_lambda, "s3_client") as s3_client:
+        s3_client.generate_presigned_post.return_value = {"url": "https://upload-bucket", "fields": {}}
+        response = id_presign_lambda.handle_api_request(body, "user@example.com")
+    return response, table, s3_client
+
+
+def test_upload_forms_limit_content_type_and_size():
+    response, table, s3_client = request_upload({
+        "identityContentType": "image/jpeg",
+        "selfieContentType": "image/png",
+    })
+
+    assert response["statusCode"] == 200
+    forms = {call.kwargs["Key"].split("/")[0]: call.kwargs for call in s3_client.generate_presigned_post.call_args_list}
+    assert set(forms) == {"identity", "selfie"}
+    for prefix, content_type in (("identity", "image/jpeg"), ("selfie", "image/png")):
+        assert forms[prefix]["Fields"] == {"Content-Type": content_type}
+        assert forms[prefix]["Conditions"] == [
+            {"Content-Type": content_type},
+            ["content-length-range", 1, MAX_IMAGE_BYTES],
+        ]
+
+
+def test_rejects_unsupported_content_types():
+    response, table, s3_client = request_upload({
+        "identityContentType": "image/jpeg",
+        "selfieContentType": "image/gif",
+    })
+
+    assert response["statusCode"] == 400
+    assert "image/gif" in response["body"]
+    table.put_item.assert_not_called()
+    s3_client.generate_presigned_post.assert_not_called()
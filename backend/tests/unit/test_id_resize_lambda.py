@@ -0,0 +1,40 @@
+from unittest import mock
+
+import pytest
+
+import id_resize_lambda
+from verification_record import MAX_IMAGE_BYTES
+
+
+def mock_s3_object(s3_client, content_type, content_length):
+    """Makes GetObject return a response with the given headers and its body mock"""
+    body = mock.Mock()
+    body.read.return_value = b"image"
+    s3_client.get_object.return_value = {
+        "ContentType": content_type,
+        "ContentLength": content_length,
+        "Body": body,
+    }
+    return body
+
+
+def test_fetches_an_eligible_image_with_a_single_request():
+    with mock.patch.object(id_resize_lambda, "s3_client") as s3_client:
+        mock_s3_object(s3_client, "image/jpeg", 5)
+        buffer = id_resize_lambda.fetch_image("upload-bucket", "identity/abc.jpg")
+
+    assert buffer.getvalue() == b"image"
+    s3_client.head_object.assert_not_called()
+
+
+@pytest.mark.parametrize("content_type, content_length", [
+    ("image/jpeg", MAX_IMAGE_BYTES + 1),
+    ("application/pdf", 5),
+])
+def test_rejects_an_ineligible_object_without_reading_it(content_type, content_length):
+    with mock.patch.object(id_resize_lambda, "s3_client") as s3_client:
+        body = mock_s3_object(s3_client, content_type, content_length)
+        with pytest.raises(ValueError):
+            id_resize_lambda.fetch_image("upload-bucket", "identity/abc.jpg")
+
+    body.read.assert_not_called()
@@ -1,15 +1,113 @@
+import json
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
+
+from idplusselfie.idplusselfie_stack import IdPlusSelfieStack
+
+SITE_ORIGIN = "https://example.cloudfront.net"
+
+WORKFLOW_HANDLERS = [
+    "id_moderate_lambda.lambda_handler",
+    "id_analyze_lambda.lambda_handler",
+    "id_compare_faces_lambda.lambda_handler",
+    "id_resize_lambda.lambda_handler",
+    "id_send_email_lambda.lambda_handler",
+]
+
+
+@pytest.fixture(scope="module")
+def template():
+    app = core.App(context={"site_origin": SITE_ORIGIN})
+    stack = IdPlusSelfieStack(
+        app, "idplusselfie",
+        env=core.Environment(account="123456789012", region="us-east-1")
+    )
+    return assertions.Template.from_stack(stack)
+
+
+@pytest.fixture(scope="module")
+def states(template):
+    """The state machine's states, with CloudFormation references blanked out"""
+    state_machine = next(iter(template.find_resources("AWS::StepFunctions::StateMachine").values()))
+    definition = state_machine["Properties"]["DefinitionString"]
+    if isinstance(definition, dict):
+        definition = "".join(
+            part if isinstance(part, str) else "REF"
+            for part in definition["Fn::Join"][1]
+        )
+    return json.loads(definition)["States"]
+
+
+def test_presign_lambda_created(template):
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "id_presign_lambda.lambda_handler",
+        "Runtime": "python3.12",
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "URL_EXPIRATION_SECONDS": "300"
+            })
+        }
+    })
+
+
+def test_presign_method_requires_cognito_and_api_key(template):
+    resources = template.find_resources("AWS::ApiGateway::Resource", {
+        "Properties": {"PathPart": "id-verify-presign"}
+    })
+    assert len(resources) == 1
+
+    template.has_resource_properties("AWS::ApiGateway::Method", {
+        "HttpMethod": "POST",
+        "ResourceId": {"Ref": next(iter(resources))},
+        "AuthorizationType": "COGNITO_USER_POOLS",
+        "ApiKeyRequired": True,
+        "Integration": assertions.Match.object_like({"Type": "AWS_PROXY"})
+    })
+
+
+def test_upload_bucket_cors_allows_only_site_posts(template):
+    template.has_resource_properties("AWS::S3::Bucket", {
+        "CorsConfiguration": {
+            "CorsRules": [{
+                "AllowedMethods": ["POST"],
+                "AllowedOrigins": [SITE_ORIGIN],
+                "AllowedHeaders": ["*"],
+                "MaxAge": 3000
+            }]
+        }
+    })
+
+
+def test_presigned_uploads_notify_the_trigger_lambda(template):
+    notifications = next(iter(template.find_resources("Custom::S3BucketNotifications").values()))
+    configurations = notifications["Properties"]["NotificationConfiguration"]["LambdaFunctionConfigurations"]
+    events = {
+        (configuration["Events"][0], configuration["Filter"]["Key"]["FilterRules"][0]["Value"])
+        for configuration in configurations
+    }
+    assert events == {
+        (event, prefix)
+        for event in ("s3:ObjectCreated:Put", "s3:ObjectCreated:Post")
+        for prefix in ("identity/", "selfie/")
+    }
+
+
+@pytest.mark.parametrize("handler", WORKFLOW_HANDLERS)
+def test_workflow_lambdas_use_snapstart(template, handler):
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": handler,
+        "SnapStart": {"ApplyOn": "PublishedVersions"}
+    })
+
 
-from idplusselfie.idplusselfie_stack import idplusselfieStack
+@pytest.mark.parametrize("state", ["SendSuccessEmail", "SendFailureEmail"])
+def test_emails_are_sent_asynchronously(states, state):
+    assert states[state]["Parameters"]["InvocationType"] == "Event"
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in idplusselfie/idplusselfie_stack.py
-def test_sqs_queue_created():
-    app = core.App()
-    stack = idplusselfieStack(app, "idplusselfie")
-    template = assertions.Template.from_stack(stack)
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+@pytest.mark.parametrize("state", ["ModerateImages", "AnalyzeIDDocument", "CompareFaces", "ResizeImages"])
+def test_workflow_tasks_receive_the_record_timestamp(states, state):
+    payload = states[state]["Parameters"]["Payload"]
+    assert payload["record_timestamp.$"] == "$.record_timestamp"
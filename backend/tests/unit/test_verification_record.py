@@ -0,0 +1,45 @@
+import base64
+from unittest import mock
+
+import pytest
+
+import id_delete_lambda
+import id_presign_lambda
+import id_resize_lambda
+import id_upload_lambda
+
+IMAGE = "data:image/jpeg;base64," + base64.b64encode(b"image").decode()
+
+
+def written_item(lambda_module, body):
+    """Runs the API request and returns the record the Lambda wrote"""
+    with mock.patch.object(lambda_module, "table") as table, \
+            mock.patch.object(lambda_module, "s3_client") as s3_client:
+        s3_client.generate_presigned_post.return_value = {"url": "https://upload-bucket", "fields": {}}
+        response = lambda_module.handle_api_request(body, "user@example.com")
+    assert response["statusCode"] == 200
+    return table.put_item.call_args.kwargs["Item"]
+
+
+def resize_output_key(source_key):
+    """Runs the resize pipeline for one image and returns the key it writes"""
+    with mock.patch.object(id_resize_lambda, "fetch_image"), \
+            mock.patch.object(id_resize_lambda, "resize_image"), \
+            mock.patch.object(id_resize_lambda, "upload_image") as upload_image:
+        id_resize_lambda.process_image("upload-bucket", source_key)
+    return upload_image.call_args.args[2]
+
+
+@pytest.mark.parametrize("lambda_module, body", [
+    (id_upload_lambda, {"identity": IMAGE, "selfie": IMAGE}),
+    (id_presign_lambda, {"identityContentType": "image/jpeg", "selfieContentType": "image/png"}),
+])
+def test_recorded_resized_keys_match_resize_output(lambda_module, body):
+    item = written_item(lambda_module, body)
+
+    for source, resized in (
+        ("IdentificationS3Key", "IdentificationImageResizedS3Key"),
+        ("SelfieImageS3Key", "SelfieImageResizedS3Key"),
+    ):
+        source_key = id_delete_lambda.get_s3_key_from_uri(item[source])
+        assert item[resized] == f"s3://upload-bucket/{resize_output_key(source_key)}"
@@ -15,6 +15,15 @@ Amplify.configure({
   }
 });
 
+// Posts a file to S3 using a presigned form; S3 requires the policy fields
+// to come before the file itself
+const postToS3 = (upload, file) => {
+  const form = new FormData();
+  Object.entries(upload.fields).forEach(([name, value]) => form.append(name, value));
+  form.append("file", file);
+  return axios.post(upload.url, form);
+};
+
 function App() {
   const [idFile, setidFile] = useState(null);
   const [selfieFile, setSelfieFile] = useState(null);
@@ -23,16 +32,7 @@ function App() {
   const [count, setCount] = useState(0);
   const [isAttested, setIsAttested] = useState(false);
 
-  const API_URL = `${process.env.REACT_APP_API_URL}id-verify`;
-
-  const convertToBase64 = (file) => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.readAsDataURL(file);
-      reader.onload = () => resolve(reader.result.split(",")[1]);
-      reader.onerror = (error) => reject(error);
-    });
-  };
+  const API_URL = `${process.env.REACT_APP_API_URL}id-verify-presign`;
 
   const uploadFiles = async () => {
     if (!idFile || !selfieFile) {
@@ -46,9 +46,6 @@ function App() {
       const { tokens } = await fetchAuthSession();
       const token = tokens.idToken.toString();
       
-      const idBase64 = await convertToBase64(idFile);
-      const selfieBase64 = await convertToBase64(selfieFile);
-      
       const headers = {
         "Content-Type": "application/json",
         "Authorization": `Bearer ${token}`,
@@ -65,8 +62,8 @@ function App() {
         method: 'post',
         url: API_URL,
         data: {
-          identity: idBase64,
-          selfie: selfieBase64,
+          identityContentType: idFile.type,
+          selfieContentType: selfieFile.type,
         },
         headers: headers,
         timeout: 30000
@@ -96,6 +93,12 @@ function App() {
         }
   
         console.log('Processed response data:', resultData);
+
+        // Upload both images directly to S3 with the presigned forms
+        await Promise.all([
+          postToS3(resultData.identityUpload, idFile),
+          postToS3(resultData.selfieUpload, selfieFile)
+        ]);
   
         if (resultData.verificationId) {
           const message = `Verification ID: ${resultData.verificationId}\n` +